@@ -21,114 +21,472 @@ Usage:
 """
 
 import argparse
+import asyncio
+import hashlib
 import json
 import os
+import sqlite3
 import sys
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
 try:
+    import numpy as np
     import pandas as pd
 except ImportError:
     print("Error: pandas required. Install with: pip install pandas")
     sys.exit(1)
 
+try:
+    import orjson  # optional: much faster serialization of float arrays
+except ImportError:
+    orjson = None
 
-def create_food_text(row: pd.Series) -> str:
-    """Create searchable text from food row."""
-    parts = []
-
-    # Food name and description
-    if pd.notna(row.get('food_description')):
-        parts.append(row['food_description'])
-
-    if pd.notna(row.get('food_common_name')):
-        parts.append(f"Also known as: {row['food_common_name']}")
-
-    if pd.notna(row.get('category')):
-        parts.append(f"Category: {row['category']}")
-
-    if pd.notna(row.get('brand_name')):
-        parts.append(f"Brand: {row['brand_name']}")
-
-    # Key nutrients
-    nutrients = []
-    nutrient_cols = [
-        ('protein', 'protein'),
-        ('total_lipid_fat', 'fat'),
-        ('carbohydrate_by_difference', 'carbs'),
-        ('calcium_ca', 'calcium'),
-        ('iron_fe', 'iron'),
-        ('magnesium_mg', 'magnesium'),
-        ('vitamin_c_total_ascorbic_acid', 'vitamin C'),
-        ('vitamin_d3_cholecalciferol', 'vitamin D'),
-        ('vitamin_b12', 'vitamin B12'),
-    ]
-
-    for col, name in nutrient_cols:
-        if col in row and pd.notna(row[col]) and row[col] > 0:
-            nutrients.append(f"{name}: {row[col]:.2f}g/100g")
-
-    if nutrients:
-        parts.append("Nutrients per 100g: " + ", ".join(nutrients[:5]))
-
-    return " | ".join(parts)
-
+try:
+    from numba import njit, prange  # optional: JIT-compiled nutrient gating
+except ImportError:
+    njit = None
+
+
+def dumps_compact(obj) -> str:
+    """Serialize one JSON value compactly, via orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"))
+
+
+# Key nutrients included in the searchable text (CSV column, display name)
+NUTRIENT_COLS = [
+    ('protein', 'protein'),
+    ('total_lipid_fat', 'fat'),
+    ('carbohydrate_by_difference', 'carbs'),
+    ('calcium_ca', 'calcium'),
+    ('iron_fe', 'iron'),
+    ('magnesium_mg', 'magnesium'),
+    ('vitamin_c_total_ascorbic_acid', 'vitamin C'),
+    ('vitamin_d3_cholecalciferol', 'vitamin D'),
+    ('vitamin_b12', 'vitamin B12'),
+]
+
+# At most this many nutrients are listed per food item
+MAX_NUTRIENTS = 5
+
+# Texts at or below this length carry no real signal (stub rows with all
+# descriptive fields null) and are not worth an embedding
+MIN_TEXT_LENGTH = 8
+
+# Below this many texts per encode call, multi-process pool startup costs
+# more than it saves
+MIN_POOL_TEXTS = 2_500
+
+# The only columns of the USDA schema this script touches
+NEEDED_COLUMNS = [
+    'fdc_id',
+    'food_description',
+    'food_common_name',
+    'category',
+    'brand_name',
+] + [col for col, _ in NUTRIENT_COLS]
+
+
+def iter_food_data(path: str, chunksize: int,
+                   limit: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Yield the USDA CSV in row chunks, reading only the columns used
+    for text building.
+
+    Chunked reading keeps peak memory at O(chunksize) regardless of file
+    size. pyarrow's streaming reader is used when available (multithreaded
+    parsing, several times faster than the C parser on the ~2 GB USDA
+    export); otherwise pandas' chunked C parser does the same job.
+    """
+    header = pd.read_csv(path, nrows=0)
+    usecols = [col for col in NEEDED_COLUMNS if col in header.columns]
+
+    def limited(chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        remaining = limit
+        for chunk in chunks:
+            if remaining is not None:
+                chunk = chunk.head(remaining)
+                remaining -= len(chunk)
+            if len(chunk):
+                yield chunk
+            if remaining == 0:
+                return
+
+    def resized(chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        # pyarrow batches by block bytes, not rows; regroup to chunksize
+        # rows so --chunksize means the same thing on both read paths
+        pending: List[pd.DataFrame] = []
+        buffered = 0
+        for chunk in chunks:
+            pending.append(chunk)
+            buffered += len(chunk)
+            while buffered >= chunksize:
+                merged = pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+                yield merged.iloc[:chunksize]
+                pending = [merged.iloc[chunksize:]]
+                buffered = len(pending[0])
+        if buffered:
+            yield pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
 
-def generate_openai_embeddings(texts: List[str], batch_size: int = 100) -> List[List[float]]:
-    """Generate embeddings using OpenAI API."""
     try:
-        from openai import OpenAI
+        from pyarrow import csv as pyarrow_csv
     except ImportError:
-        print("Error: openai library required. Install with: pip install openai")
-        sys.exit(1)
+        yield from limited(pd.read_csv(path, usecols=usecols, chunksize=chunksize))
+        return
+
+    reader = pyarrow_csv.open_csv(
+        path,
+        convert_options=pyarrow_csv.ConvertOptions(
+            include_columns=usecols,
+            # pyarrow reads empty string fields as "" by default; pandas
+            # reads them as NaN, which the notna() gates depend on
+            strings_can_be_null=True,
+        ),
+    )
+    yield from limited(resized(batch.to_pandas() for batch in reader))
+
+
+class NpyWriter:
+    """Incrementally write float16 rows to a .npy file.
+
+    The row count is unknown until the input has been fully streamed, so a
+    fixed-size header slot is reserved up front and filled in on close.
+    """
+
+    HEADER_SPACE = 128
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(b'\x00' * self.HEADER_SPACE)
+        self.rows = 0
+        self.dimension = 0
+
+    def write(self, embeddings: np.ndarray) -> None:
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float16)
+        if embeddings.size == 0:
+            return
+        self.dimension = embeddings.shape[1]
+        self.file.write(embeddings.tobytes())
+        self.rows += embeddings.shape[0]
+
+    def close(self) -> None:
+        # magic (6) + version (2) + header length (2) + header text
+        header = ("{'descr': '<f2', 'fortran_order': False, "
+                  "'shape': (%d, %d), }" % (self.rows, self.dimension))
+        padding = self.HEADER_SPACE - 10 - len(header) - 1
+        header_bytes = (header + ' ' * padding + '\n').encode('latin1')
+
+        self.file.seek(0)
+        self.file.write(np.lib.format.MAGIC_PREFIX + bytes([1, 0]))
+        self.file.write(len(header_bytes).to_bytes(2, 'little'))
+        self.file.write(header_bytes)
+        self.file.close()
+
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _nutrient_mask_jit(N):
+        mask = np.zeros(N.shape, dtype=np.bool_)
+        for i in prange(N.shape[0]):
+            kept = 0
+            for j in range(N.shape[1]):
+                if N[i, j] > 0 and kept < MAX_NUTRIENTS:
+                    mask[i, j] = True
+                    kept += 1
+        return mask
+
+
+def nutrient_mask(N: np.ndarray) -> np.ndarray:
+    """Mask of nutrient cells to report: positive values, capped at
+    MAX_NUTRIENTS per row in column order.
+
+    Uses a parallel numba kernel when numba is installed (one fused pass
+    over the matrix, no intermediate arrays); otherwise falls back to the
+    equivalent numpy expression.
+    """
+    if njit is not None:
+        return _nutrient_mask_jit(N)
+    mask = (N > 0) & ~np.isnan(N)
+    mask &= np.cumsum(mask, axis=1) <= MAX_NUTRIENTS
+    return mask
+
+
+def build_nutrient_texts(df: pd.DataFrame) -> pd.Series:
+    """Build the 'Nutrients per 100g: ...' fragment for every row at once."""
+    cols = [(col, name) for col, name in NUTRIENT_COLS if col in df.columns]
+    if not cols:
+        return pd.Series("", index=df.index)
+
+    N = df[[col for col, _ in cols]].astype('float32').to_numpy()
+    mask = nutrient_mask(N)
+
+    # Format exactly the reported cells in one pass: the mask picks the
+    # (row, column) pairs, and %.2f runs only on those values
+    prefixes = np.array([f"{name}: " for _, name in cols], dtype=object)
+    rows, columns = np.nonzero(mask)
+    cells = np.full(N.shape, "", dtype=object)
+    cells[rows, columns] = (
+        prefixes[columns]
+        + np.char.mod('%.2f', N[rows, columns]).astype(object)
+        + "g/100g"
+    )
 
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        print("Error: OPENAI_API_KEY environment variable not set")
-        print("\nTo set it:")
-        print("  export OPENAI_API_KEY='your-api-key-here'")
-        print("\nGet your API key from: https://platform.openai.com/api-keys")
-        sys.exit(1)
+    joined = [", ".join(cell for cell in row if cell) for row in cells]
+    return pd.Series(
+        [f"Nutrients per 100g: {j}" if j else "" for j in joined],
+        index=df.index,
+    )
 
-    client = OpenAI(api_key=api_key)
-    embeddings = []
 
-    print(f"Generating embeddings for {len(texts)} texts...")
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i + batch_size]
-        response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=batch
-        )
-        batch_embeddings = [item.embedding for item in response.data]
-        embeddings.extend(batch_embeddings)
-        print(f"  Processed {min(i + batch_size, len(texts))}/{len(texts)}")
+def build_food_texts(df: pd.DataFrame) -> List[str]:
+    """Create searchable text for all food rows using vectorized column ops.
 
-    return embeddings
+    Avoids per-row ``df.apply`` (which materializes a Series and calls
+    ``pd.notna`` once per cell) in favor of column-wise string building.
+    """
 
+    def prefixed(col: str, prefix: str = "") -> pd.Series:
+        if col not in df.columns:
+            return pd.Series("", index=df.index)
+        return (prefix + df[col].astype(str)).where(df[col].notna(), "")
 
-def generate_local_embeddings(texts: List[str], batch_size: int = 32) -> List[List[float]]:
-    """Generate embeddings using local sentence-transformers model."""
-    try:
-        from sentence_transformers import SentenceTransformer
-    except ImportError:
-        print("Error: sentence-transformers required for local embeddings")
-        print("Install with: pip install sentence-transformers")
-        sys.exit(1)
+    columns = [
+        prefixed('food_description'),
+        prefixed('food_common_name', 'Also known as: '),
+        prefixed('category', 'Category: '),
+        prefixed('brand_name', 'Brand: '),
+        build_nutrient_texts(df),
+    ]
 
-    print("Loading local embedding model (all-MiniLM-L6-v2)...")
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    # Branchless join: append the separator to every non-empty part,
+    # accumulate column-wise, then strip the trailing separator
+    combined = None
+    for col in columns:
+        piece = (col + " | ").where(col != "", "")
+        combined = piece if combined is None else combined + piece
+
+    return combined.str.replace(r" \| $", "", regex=True).tolist()
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache in a sidecar SQLite file.
+
+    Keys are sha256(model + text), values are float16 vector bytes, so a
+    rerun after tweaking a descriptive column only re-embeds the rows
+    whose text actually changed.
+    """
+
+    def __init__(self, cache_dir: str, model: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.model = model
+        self.db = sqlite3.connect(os.path.join(cache_dir, "embeddings.sqlite3"))
+        self.db.execute("CREATE TABLE IF NOT EXISTS emb (k BLOB PRIMARY KEY, v BLOB)")
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256((self.model + text).encode()).digest()
+
+    def get_many(self, texts: List[str]) -> dict:
+        """Return {index: vector} for the texts already cached."""
+        found = {}
+        for i, text in enumerate(texts):
+            row = self.db.execute(
+                "SELECT v FROM emb WHERE k = ?", (self.key(text),)).fetchone()
+            if row:
+                found[i] = np.frombuffer(row[0], dtype=np.float16)
+        return found
+
+    def put_many(self, texts: List[str], vectors) -> None:
+        self.db.executemany(
+            "INSERT OR REPLACE INTO emb (k, v) VALUES (?, ?)",
+            [(self.key(text), np.asarray(vector, dtype=np.float16).tobytes())
+             for text, vector in zip(texts, vectors)])
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def generate_openai_embeddings(
+    texts: List[str],
+    batch_size: int = 100,
+    max_concurrency: int = 35,
+    cache: Optional[EmbeddingCache] = None,
+) -> Iterator[List[List[float]]]:
+    """Generate embeddings using OpenAI API, yielding one batch at a time.
+
+    Batches are sent concurrently (bounded by ``max_concurrency``) so wall
+    time is no longer one network round-trip per batch. Rate-limit and
+    timeout errors are retried with exponential backoff. The default
+    concurrency suits OpenAI tier 1; higher tiers can go to 60-125.
+
+    When a ``cache`` is supplied, texts already embedded by a previous run
+    are served from it and only the misses hit the API.
+    """
+    cached = cache.get_many(texts) if cache is not None else {}
+    if cached:
+        print(f"  Cache hits: {len(cached)}/{len(texts)}")
+    missing = [i for i in range(len(texts)) if i not in cached]
+    missing_texts = [texts[i] for i in missing]
+
+    vectors: List[Optional[List[float]]] = [None] * len(texts)
+    for i, vector in cached.items():
+        vectors[i] = vector
+
+    if missing_texts:
+        try:
+            from openai import APITimeoutError, AsyncOpenAI, RateLimitError
+        except ImportError:
+            print("Error: openai library required. Install with: pip install openai")
+            sys.exit(1)
+
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            print("Error: OPENAI_API_KEY environment variable not set")
+            print("\nTo set it:")
+            print("  export OPENAI_API_KEY='your-api-key-here'")
+            print("\nGet your API key from: https://platform.openai.com/api-keys")
+            sys.exit(1)
+
+        batches = [missing_texts[i:i + batch_size]
+                   for i in range(0, len(missing_texts), batch_size)]
+        results: List[Optional[List[List[float]]]] = [None] * len(batches)
+
+        async def embed_all():
+            client = AsyncOpenAI(api_key=api_key)
+            semaphore = asyncio.Semaphore(max_concurrency)
+            done = 0
+
+            async def embed_batch(index: int, batch: List[str]):
+                nonlocal done
+                async with semaphore:
+                    delay = 1.0
+                    for attempt in range(5):
+                        try:
+                            response = await client.embeddings.create(
+                                model="text-embedding-3-small",
+                                input=batch
+                            )
+                            break
+                        except (RateLimitError, APITimeoutError):
+                            if attempt == 4:
+                                raise
+                            await asyncio.sleep(delay)
+                            delay *= 2
+                    results[index] = [item.embedding for item in response.data]
+                    done += 1
+                    print(f"  Processed {done}/{len(batches)} batches")
+
+            try:
+                await asyncio.gather(
+                    *(embed_batch(i, batch) for i, batch in enumerate(batches))
+                )
+            finally:
+                await client.close()
+
+        print(f"Generating embeddings for {len(missing_texts)} texts "
+              f"({len(batches)} batches, concurrency {max_concurrency})...")
+        asyncio.run(embed_all())
+
+        new_vectors = [vector for batch in results for vector in batch]
+        if cache is not None:
+            cache.put_many(missing_texts, new_vectors)
+        for i, vector in zip(missing, new_vectors):
+            vectors[i] = vector
+
+    for i in range(0, len(vectors), batch_size):
+        yield vectors[i:i + batch_size]
+
+
+_local_model = None
+_local_pool = None
+
+
+def get_local_model():
+    """Load the sentence-transformers model once, reusing it across chunks."""
+    global _local_model
+    if _local_model is None:
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            print("Error: sentence-transformers required for local embeddings")
+            print("Install with: pip install sentence-transformers")
+            sys.exit(1)
+
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        print(f"Loading local embedding model (all-MiniLM-L6-v2) on {device}...")
+        _local_model = SentenceTransformer('all-MiniLM-L6-v2', device=device)
+    return _local_model
+
+
+def get_local_pool(model):
+    """Start the CPU encode workers once, reusing them across chunks.
+
+    One BLAS thread per worker, otherwise N workers x N BLAS threads
+    oversubscribe the machine.
+    """
+    global _local_pool
+    if _local_pool is None:
+        os.environ.setdefault("OMP_NUM_THREADS", "1")
+        workers = min(8, os.cpu_count() or 1)
+        print(f"  Starting {workers} CPU encode workers")
+        _local_pool = model.start_multi_process_pool(target_devices=['cpu'] * workers)
+    return _local_pool
+
+
+def stop_local_pool() -> None:
+    """Tear down the CPU encode workers, if they were ever started."""
+    global _local_pool
+    if _local_pool is not None:
+        _local_model.stop_multi_process_pool(_local_pool)
+        _local_pool = None
+
+
+def generate_local_embeddings(texts: List[str], batch_size: int = 32) -> Iterator[List[List[float]]]:
+    """Generate embeddings using local sentence-transformers model.
+
+    Texts are encoded in length-sorted order so each batch pads to a
+    similar maximum length (attention cost grows with the longest text in
+    a batch), then unpermuted back to input order before yielding.
+    """
+    model = get_local_model()
+    on_gpu = str(model.device).startswith('cuda')
+    if on_gpu:
+        # GPU throughput keeps improving well past the CPU-friendly default
+        batch_size = max(batch_size, 256)
 
     print(f"Generating embeddings for {len(texts)} texts...")
-    embeddings = model.encode(
-        texts,
-        batch_size=batch_size,
-        show_progress_bar=True,
-        convert_to_numpy=True
-    )
+    order = np.argsort([len(text) for text in texts])
+    sorted_texts = [texts[i] for i in order]
+
+    cpu_count = os.cpu_count() or 1
+    if not on_gpu and cpu_count > 4 and len(sorted_texts) >= MIN_POOL_TEXTS:
+        # On CPU, single-process encoding leaves tokenization serialized;
+        # fan it out across workers. Work-unit sizing is left to
+        # sentence-transformers, which scales it down with the input so
+        # small chunks still spread across all workers
+        pool = get_local_pool(model)
+        sorted_embeddings = model.encode_multi_process(
+            sorted_texts,
+            pool,
+            batch_size=batch_size
+        )
+    else:
+        sorted_embeddings = model.encode(
+            sorted_texts,
+            batch_size=batch_size,
+            show_progress_bar=True,
+            convert_to_numpy=True
+        )
+
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    embeddings = sorted_embeddings[inverse]
 
-    return embeddings.tolist()
+    for i in range(0, len(embeddings), batch_size):
+        yield embeddings[i:i + batch_size].tolist()
 
 
 def main():
@@ -160,6 +518,23 @@ def main():
         default=100,
         help="Batch size for embedding generation"
     )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=35,
+        help="Maximum concurrent OpenAI requests (default: 35, suits tier 1)"
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=50_000,
+        help="CSV rows processed per chunk (default: 50000)"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=".embed-cache",
+        help="Directory for the OpenAI embedding cache (default: .embed-cache)"
+    )
 
     args = parser.parse_args()
 
@@ -172,56 +547,103 @@ def main():
     output_dir = args.output or "output/embeddings"
     os.makedirs(output_dir, exist_ok=True)
 
-    # Load data
-    print(f"Loading data from {args.input}...")
-    df = pd.read_csv(args.input)
-
-    if args.limit:
-        df = df.head(args.limit)
-        print(f"Limited to {args.limit} rows")
-
-    print(f"Loaded {len(df)} food items")
-
-    # Create text for embedding
-    print("Creating searchable text for each food item...")
-    texts = df.apply(create_food_text, axis=1).tolist()
-
-    # Generate embeddings
     if args.local:
-        print("\nUsing local embeddings (sentence-transformers)")
-        embeddings = generate_local_embeddings(texts, args.batch_size)
         model_name = "all-MiniLM-L6-v2"
+        cache = None
+        print("Using local embeddings (sentence-transformers)")
     else:
-        print("\nUsing OpenAI embeddings (text-embedding-3-small)")
-        embeddings = generate_openai_embeddings(texts, args.batch_size)
         model_name = "text-embedding-3-small"
+        cache = EmbeddingCache(args.cache_dir, model_name)
+        print("Using OpenAI embeddings (text-embedding-3-small)")
+
+    # Vectors go to a float16 .npy (half the bytes of float32, ~15x
+    # smaller than JSON text); fdc_id/text metadata goes to a JSON sidecar.
+    # The CSV is streamed in chunks, so peak memory is O(chunksize) no
+    # matter how large the export is.
+    embeddings_file = os.path.join(output_dir, "usda_embeddings.npy")
+    metadata_file = os.path.join(output_dir, "usda_embeddings.json")
+    print(f"Processing {args.input} in chunks of {args.chunksize} rows...")
+
+    count = 0
+    dropped = 0
+    total_unique = 0
+    writer = NpyWriter(embeddings_file)
+    with open(metadata_file, 'w') as f:
+        f.write('{"model": %s, "embeddings_file": %s, "dtype": "float16", "items": [' % (
+            json.dumps(model_name),
+            json.dumps(os.path.basename(embeddings_file)),
+        ))
+
+        for df in iter_food_data(args.input, args.chunksize, args.limit):
+            texts = build_food_texts(df)
+
+            # Stub rows with no descriptive content get no vector; they
+            # are marked "dropped" in the metadata instead, so the .npy
+            # rows line up with the non-dropped items in order
+            keep = pd.Series(texts).str.len().to_numpy() > MIN_TEXT_LENGTH
+            kept_texts = [text for text, k in zip(texts, keep) if k]
+            dropped += len(texts) - len(kept_texts)
+
+            if kept_texts:
+                # Branded foods often share identical descriptions under
+                # different fdc_ids; embed each distinct text once and
+                # scatter the results back
+                unique_texts, inverse = np.unique(kept_texts, return_inverse=True)
+                total_unique += len(unique_texts)
+
+                if args.local:
+                    batches = generate_local_embeddings(
+                        unique_texts.tolist(), args.batch_size)
+                else:
+                    batches = generate_openai_embeddings(
+                        unique_texts.tolist(), args.batch_size,
+                        args.max_concurrency, cache)
+
+                unique_embeddings = np.vstack(
+                    [np.asarray(batch, dtype=np.float16) for batch in batches])
+                writer.write(unique_embeddings[inverse])
+
+            # Positional id lookup; iterrows() would build a Series per
+            # row just to read one field
+            if 'fdc_id' in df.columns:
+                fdc_ids = df['fdc_id'].astype(str).to_numpy()
+            else:
+                fdc_ids = np.arange(count, count + len(df)).astype(str)
+
+            for i in range(len(texts)):
+                item = {
+                    "fdc_id": fdc_ids[i],
+                    "text": texts[i],
+                }
+                if not keep[i]:
+                    item["dropped"] = True
+                if count:
+                    f.write(",")
+                f.write(dumps_compact(item))
+                count += 1
+
+            print(f"  Processed {count} rows")
+
+        f.write('], "count": %d, "embedded": %d, "dimension": %d}' % (
+            count, writer.rows, writer.dimension))
+    writer.close()
+    if cache is not None:
+        cache.close()
+    if args.local:
+        stop_local_pool()
+
+    if dropped:
+        print(f"Skipped {dropped} rows with no descriptive content")
+    if total_unique < writer.rows:
+        print(f"Embedded {total_unique} unique texts for {writer.rows} rows "
+              f"({1 - total_unique / writer.rows:.1%} duplicates)")
 
-    # Save embeddings
-    output_file = os.path.join(output_dir, "usda_embeddings.json")
-    print(f"\nSaving embeddings to {output_file}...")
-
-    data = {
-        "model": model_name,
-        "count": len(embeddings),
-        "dimension": len(embeddings[0]) if embeddings else 0,
-        "items": [
-            {
-                "fdc_id": str(row.get('fdc_id', i)),
-                "text": texts[i],
-                "embedding": embeddings[i]
-            }
-            for i, (_, row) in enumerate(df.iterrows())
-        ]
-    }
-
-    with open(output_file, 'w') as f:
-        json.dump(data, f)
-
-    file_size = os.path.getsize(output_file) / (1024 * 1024)
-    print(f"\nEmbeddings saved: {output_file} ({file_size:.1f} MB)")
+    file_size = os.path.getsize(embeddings_file) / (1024 * 1024)
+    print(f"\nEmbeddings saved: {embeddings_file} ({file_size:.1f} MB)")
+    print(f"  Metadata: {metadata_file}")
     print(f"  Model: {model_name}")
-    print(f"  Items: {len(embeddings)}")
-    print(f"  Dimensions: {len(embeddings[0]) if embeddings else 0}")
+    print(f"  Items: {count}")
+    print(f"  Dimensions: {writer.dimension}")
 
 
 if __name__ == "__main__":
@@ -15,20 +15,67 @@ Usage:
 """
 
 import argparse
+import asyncio
 import json
 import sys
-from typing import Optional
+from typing import List, Optional
 from urllib.parse import urlencode
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 except ImportError:
     print("Error: requests library required. Install with: pip install requests")
     sys.exit(1)
 
+try:
+    import orjson  # optional: much faster parsing of large label payloads
+except ImportError:
+    orjson = None
+
+
+def loads_response(response) -> dict:
+    """Parse a JSON API response body, via orjson when available."""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def dumps_compact(obj) -> str:
+    """Serialize one JSON value compactly, via orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def dumps_pretty(obj) -> str:
+    """Pretty-print a JSON value for display, via orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2)
+
+
 # NIH DSLD API Configuration
 DSLD_BASE_URL = "https://api.ods.od.nih.gov/dsld/v9"
 
+# Shared session: reuses TCP/TLS connections across queries (saving a
+# handshake per request) and retries transient server/rate-limit errors
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+    ),
+))
+SESSION.headers.update({
+    "Accept-Encoding": "gzip",
+    "User-Agent": "open-diet-data/1.0",
+})
+
 # API Endpoints (no key required)
 ENDPOINTS = {
     "search": "/browse",
@@ -46,18 +93,18 @@ def search_products(query: str, limit: int = 10) -> dict:
         "page": 1,
     }
 
-    response = requests.get(url, params=params, timeout=30)
+    response = SESSION.get(url, params=params, timeout=30)
     response.raise_for_status()
-    return response.json()
+    return loads_response(response)
 
 
 def get_product_label(dsld_id: str) -> dict:
     """Get detailed label information for a specific product."""
     url = f"{DSLD_BASE_URL}/label/{dsld_id}"
 
-    response = requests.get(url, timeout=30)
+    response = SESSION.get(url, timeout=30)
     response.raise_for_status()
-    return response.json()
+    return loads_response(response)
 
 
 def search_by_ingredient(ingredient: str, limit: int = 10) -> dict:
@@ -69,9 +116,9 @@ def search_by_ingredient(ingredient: str, limit: int = 10) -> dict:
         "page": 1,
     }
 
-    response = requests.get(url, params=params, timeout=30)
+    response = SESSION.get(url, params=params, timeout=30)
     response.raise_for_status()
-    return response.json()
+    return loads_response(response)
 
 
 def search_by_brand(brand: str, limit: int = 10) -> dict:
@@ -83,9 +130,105 @@ def search_by_brand(brand: str, limit: int = 10) -> dict:
         "page": 1,
     }
 
-    response = requests.get(url, params=params, timeout=30)
+    response = SESSION.get(url, params=params, timeout=30)
     response.raise_for_status()
-    return response.json()
+    return loads_response(response)
+
+
+# Page size used when enumerating the whole catalog in --bulk mode
+BULK_PAGE_SIZE = 100
+
+
+async def _get_json(client, semaphore, url: str, params: Optional[dict] = None) -> dict:
+    """GET one URL under the shared semaphore, honoring 429 Retry-After."""
+    async with semaphore:
+        delay = 1.0
+        for _ in range(5):
+            response = await client.get(url, params=params)
+            if response.status_code == 429:
+                retry_after = response.headers.get("Retry-After")
+                await asyncio.sleep(float(retry_after) if retry_after else delay)
+                delay *= 2
+                continue
+            response.raise_for_status()
+            return loads_response(response)
+        response.raise_for_status()
+        return loads_response(response)
+
+
+async def bulk_fetch_labels(client, semaphore, dsld_ids: List[str], output) -> int:
+    """Fetch full label details for many DSLD IDs concurrently, writing
+    each label to ``output`` as JSONL as soon as it arrives."""
+    tasks = [
+        asyncio.ensure_future(_get_json(client, semaphore, f"/label/{dsld_id}"))
+        for dsld_id in dsld_ids
+    ]
+    written = 0
+    for task in asyncio.as_completed(tasks):
+        output.write(dumps_compact(await task) + "\n")
+        written += 1
+        if written % 100 == 0:
+            print(f"  Fetched {written}/{len(tasks)} labels")
+    return written
+
+
+async def _bulk_fetch(httpx, params: dict, output_path: str,
+                      concurrency: int, fetch_labels: bool) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(
+        base_url=DSLD_BASE_URL,
+        limits=httpx.Limits(max_connections=concurrency),
+        timeout=30,
+        headers={"User-Agent": "open-diet-data/1.0"},
+    ) as client:
+        def page_params(page: int) -> dict:
+            return {**params, "pagesize": BULK_PAGE_SIZE, "page": page}
+
+        first = await _get_json(client, semaphore, "/browse", page_params(1))
+        total = first.get("totalHits", first.get("total", 0))
+        n_pages = max(1, -(-int(total) // BULK_PAGE_SIZE)) if total else 1
+        print(f"Fetching {n_pages} pages ({total or 'unknown'} products, "
+              f"concurrency {concurrency})...")
+
+        page_tasks = [
+            asyncio.ensure_future(_get_json(client, semaphore, "/browse", page_params(page)))
+            for page in range(2, n_pages + 1)
+        ]
+
+        written = 0
+        with open(output_path, "w") as f:
+            async def handle_page(page: dict) -> int:
+                products = page.get("products", page.get("data", []))
+                if fetch_labels:
+                    ids = [str(p.get("dsld_id", p.get("id", ""))) for p in products]
+                    return await bulk_fetch_labels(
+                        client, semaphore, [i for i in ids if i], f)
+                for product in products:
+                    f.write(dumps_compact(product) + "\n")
+                return len(products)
+
+            written += await handle_page(first)
+            for task in asyncio.as_completed(page_tasks):
+                written += await handle_page(await task)
+
+        print(f"\nWrote {written} records to {output_path}")
+
+
+def bulk_fetch(params: dict, output_path: str, concurrency: int = 16,
+               fetch_labels: bool = False) -> None:
+    """Materialize every page of a browse query (optionally each product's
+    full label) to a JSONL file using bounded concurrent requests."""
+    try:
+        import httpx
+    except ImportError:
+        print("Error: httpx required for --bulk. Install with: pip install httpx")
+        sys.exit(1)
+
+    try:
+        asyncio.run(_bulk_fetch(httpx, params, output_path, concurrency, fetch_labels))
+    except httpx.HTTPError as e:
+        print(f"Error during bulk fetch: {e}")
+        sys.exit(1)
 
 
 def format_product(product: dict) -> str:
@@ -133,6 +276,27 @@ def main():
         action="store_true",
         help="Output raw JSON"
     )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="Fetch every result page for the query and write JSONL"
+    )
+    parser.add_argument(
+        "--bulk-labels",
+        action="store_true",
+        help="With --bulk, also fetch each product's full label"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="Concurrent requests in --bulk mode (default: 16)"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        default="dsld_bulk.jsonl",
+        help="Output JSONL path for --bulk mode (default: dsld_bulk.jsonl)"
+    )
 
     args = parser.parse_args()
 
@@ -152,25 +316,39 @@ def main():
         print("  python query-nih-dsld.py --label 123456 --json")
         sys.exit(0)
 
+    if args.bulk:
+        if args.product:
+            params = {"name": args.product}
+        elif args.ingredient:
+            params = {"ingredient": args.ingredient}
+        elif args.brand:
+            params = {"brandname": args.brand}
+        else:
+            print("Error: --bulk requires --product, --ingredient, or --brand")
+            sys.exit(1)
+
+        bulk_fetch(params, args.output, args.concurrency, args.bulk_labels)
+        sys.exit(0)
+
     try:
         if args.label:
             print(f"Fetching label for DSLD ID: {args.label}")
             result = get_product_label(args.label)
 
             if args.json:
-                print(json.dumps(result, indent=2))
+                print(dumps_pretty(result))
             else:
                 print("\n" + "=" * 60)
                 print("Product Label Details")
                 print("=" * 60)
-                print(json.dumps(result, indent=2))
+                print(dumps_pretty(result))
 
         elif args.ingredient:
             print(f"Searching for products with ingredient: {args.ingredient}")
             result = search_by_ingredient(args.ingredient, args.limit)
 
             if args.json:
-                print(json.dumps(result, indent=2))
+                print(dumps_pretty(result))
             else:
                 products = result.get("products", result.get("data", []))
                 print(f"\nFound {len(products)} products:\n")
@@ -184,7 +362,7 @@ def main():
             result = search_by_brand(args.brand, args.limit)
 
             if args.json:
-                print(json.dumps(result, indent=2))
+                print(dumps_pretty(result))
             else:
                 products = result.get("products", result.get("data", []))
                 print(f"\nFound {len(products)} products:\n")
@@ -198,7 +376,7 @@ def main():
             result = search_products(args.product, args.limit)
 
             if args.json:
-                print(json.dumps(result, indent=2))
+                print(dumps_pretty(result))
             else:
                 products = result.get("products", result.get("data", []))
                 print(f"\nFound {len(products)} products:\n")